@@ -0,0 +1,30 @@
+import os
+import sys
+
+# Gunicorn configuration for BracesCareBot (loaded automatically from the working directory)
+# Honour the platform-assigned PORT, as gunicorn does without a config file
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# The dev workflow runs with --reload: keep it to one worker that imports fresh code
+reload_mode = '--reload' in sys.argv
+
+# Each worker has its own threads, Gemini loop and connection pool, so size by
+# the CPUs this process may use (not the host's) and cap it for containers
+MAX_WORKERS = 4
+
+def default_workers():
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # sched_getaffinity is Linux-only
+        cpus = os.cpu_count() or 1
+    return min(cpus, MAX_WORKERS)
+
+# Threaded workers keep serving while requests wait on Gemini
+workers = 1 if reload_mode else int(os.environ.get('WEB_CONCURRENCY', default_workers()))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# Load the app once in the master so the knowledge base index, keyword tables
+# and rendered index page are shared copy-on-write between workers
+preload_app = not reload_mode
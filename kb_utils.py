@@ -0,0 +1,163 @@
+# Keyword tables for BracesCareBot: knowledge base, red flags and language hints.
+# Everything is built once at import and shared by every importer of this module.
+
+import json
+import logging
+import re
+from dataclasses import dataclass
+
+# Module logger so logging here doesn't configure the root logger before the app does
+logger = logging.getLogger(__name__)
+
+# Load knowledge base
+def load_knowledge_base():
+    try:
+        with open('kb/ortho_kb.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error("Failed to load knowledge base: %s", e)
+        return {}
+
+# Red flag keywords for medical safety
+RED_FLAG_KEYWORDS = [
+    'fever', 'swelling', 'uncontrolled bleeding', 'severe pain', 
+    'infection', 'pus', 'emergency', 'urgent', 'difficulty breathing',
+    'difficulty swallowing', 'allergic reaction', 'rash', 'nausea',
+    'vomiting', 'dizziness', 'fainting'
+]
+
+# Other word forms that raise each red flag (plurals, inflections)
+RED_FLAG_FORMS = {
+    'fever': ['fevers', 'feverish'],
+    'swelling': ['swellings', 'swollen'],
+    'uncontrolled bleeding': ['bleeding uncontrollably'],
+    'severe pain': ['severe pains', 'severely painful'],
+    'infection': ['infections', 'infected'],
+    'emergency': ['emergencies'],
+    'urgent': ['urgently', 'urgency'],
+    'allergic reaction': ['allergic reactions'],
+    'rash': ['rashes'],
+    'nausea': ['nauseous', 'nauseated', 'nauseating'],
+    'vomiting': ['vomit', 'vomited', 'vomits'],
+    'dizziness': ['dizzy'],
+    'fainting': ['faint', 'fainted', 'faints'],
+}
+
+def build_keyword_matcher(keywords):
+    """Compile keywords into a single-pass matcher yielding each keyword hit"""
+    # An empty pattern would match the empty string everywhere
+    if not keywords:
+        return lambda text: ()
+    
+    # Longest keywords first so overlapping alternatives prefer the fuller match
+    pattern = re.compile('|'.join(map(re.escape, sorted(keywords, key=len, reverse=True))))
+    return pattern.findall
+
+# Word tokens shared by red flag and knowledge base lookups. Apostrophes split
+# words so "fever's" or "'rash'" still yield the bare keyword
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+@dataclass(frozen=True)
+class NormalizedMessage:
+    """User message with its lowercased text and tokens computed once per request"""
+    raw: str
+    lower: str
+    tokens: frozenset
+
+def normalize_message(text):
+    """Lowercase and tokenize a user message for the keyword lookups"""
+    text_lower = text.lower()
+    return NormalizedMessage(raw=text, lower=text_lower, tokens=frozenset(TOKEN_RE.findall(text_lower)))
+
+# Every form mapped back to its keyword. Single-word forms are found by
+# intersecting message tokens with this map, so 'pushed' doesn't trigger 'pus'
+RED_FLAG_FORM_KEYWORDS = {
+    form: keyword
+    for keyword in RED_FLAG_KEYWORDS
+    for form in (keyword, *RED_FLAG_FORMS.get(keyword, ()))
+}
+SINGLE_WORD_FLAGS = {form: keyword for form, keyword in RED_FLAG_FORM_KEYWORDS.items() if ' ' not in form}
+MULTI_WORD_FLAGS = {form: keyword for form, keyword in RED_FLAG_FORM_KEYWORDS.items() if ' ' in form}
+MULTI_WORD_FLAG_RE = re.compile(
+    r'\b(' + '|'.join(map(re.escape, sorted(MULTI_WORD_FLAGS, key=len, reverse=True))) + r')\b'
+)
+
+def build_keyword_index(keywords_by_key):
+    """Build keyword -> key indexes for single-word keywords and phrases"""
+    word_index = {}
+    phrase_index = {}
+    for key, keywords in keywords_by_key.items():
+        for keyword in keywords:
+            keyword = keyword.lower()
+            # Keywords that don't survive tokenization (spaces, hyphens) are matched as phrases
+            index = word_index if TOKEN_RE.fullmatch(keyword) else phrase_index
+            index.setdefault(keyword, []).append(key)
+    return word_index, phrase_index
+
+def build_kb_index(kb):
+    """Build keyword -> topic indexes for single-word keywords and phrases"""
+    return build_keyword_index({topic: info.get('keywords', []) for topic, info in kb.items()})
+
+knowledge_base = load_knowledge_base()
+KB_INDEX, KB_PHRASE_INDEX = build_kb_index(knowledge_base)
+KB_PHRASE_MATCHER = build_keyword_matcher(list(KB_PHRASE_INDEX))
+KB_MIN_KEYWORD_LENGTH = min(map(len, KB_INDEX), default=1)
+
+def match_token_prefixes(token, index, min_length):
+    """Yield index values for every keyword that is a prefix of the token"""
+    # Prefix lookups keep inflected forms matching ('wires', 'hurts', 'painful')
+    for end in range(min_length, len(token) + 1):
+        yield from index.get(token[:end], ())
+
+# Common words per language, checked in priority order
+LANG_KEYWORDS = {
+    'isiZulu': ['ngiyabonga', 'sawubona', 'yebo', 'cha', 'kanjani', 'ngicela', 'amazinyo', 'ukudla'],
+    'isiXhosa': ['enkosi', 'molo', 'ewe', 'hayi', 'kunjani', 'ndicela', 'amazinyo', 'ukutya'],
+    'Afrikaans': ['dankie', 'hallo', 'ja', 'nee', 'hoe gaan dit', 'asseblief', 'tande', 'eet'],
+    'Sesotho': ['kea leboha', 'dumela', 'ee', 'tjhe', 'ho joang', 'ke kopa', 'meno', 'ho ja'],
+}
+
+# All languages share one word index and one phrase pattern, so detection is a
+# single lookup over the message tokens regardless of how many languages exist
+LANG_WORD_INDEX, LANG_PHRASE_INDEX = build_keyword_index(LANG_KEYWORDS)
+LANG_PHRASE_RE = re.compile(r'\b(' + '|'.join(map(re.escape, LANG_PHRASE_INDEX)) + r')\b')
+
+def detect_language(message):
+    """Simple language detection based on common patterns"""
+    found = {lang for token in message.tokens for lang in LANG_WORD_INDEX.get(token, ())}
+    found.update(lang for phrase in LANG_PHRASE_RE.findall(message.lower) for lang in LANG_PHRASE_INDEX[phrase])
+    
+    for lang in LANG_KEYWORDS:
+        if lang in found:
+            return lang
+    
+    # Default to English
+    return 'English'
+
+def check_red_flags(message):
+    """Check if message contains red flag keywords"""
+    found = {SINGLE_WORD_FLAGS[token] for token in message.tokens & SINGLE_WORD_FLAGS.keys()}
+    found.update(MULTI_WORD_FLAGS[form] for form in MULTI_WORD_FLAG_RE.findall(message.lower))
+    # Keep the original keyword ordering for stable API output
+    return [keyword for keyword in RED_FLAG_KEYWORDS if keyword in found]
+
+def search_knowledge_base(message):
+    """Search knowledge base for relevant information"""
+    topics = {
+        topic
+        for token in message.tokens
+        for topic in match_token_prefixes(token, KB_INDEX, KB_MIN_KEYWORD_LENGTH)
+    }
+    topics.update(topic for phrase in KB_PHRASE_MATCHER(message.lower) for topic in KB_PHRASE_INDEX[phrase])
+    
+    # Preserve knowledge base ordering in the results
+    relevant_info = []
+    for topic, info in knowledge_base.items():
+        if topic in topics:
+            relevant_info.append({
+                'topic': topic,
+                'content': info.get('content', ''),
+                'tips': info.get('tips', [])
+            })
+    
+    return relevant_info
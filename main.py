@@ -1,9 +1,15 @@
 import os
 import json
+import asyncio
+import threading
 import logging
 import base64
 import io
-from flask import Flask, request, jsonify, render_template, send_from_directory
+import queue
+import hashlib
+import httpx
+from collections import OrderedDict
+from flask import Flask, Response, request, jsonify, render_template, send_file, send_from_directory, stream_with_context
 try:
     from google import genai
 except ImportError:
@@ -12,17 +18,107 @@ except ImportError:
 from google.genai import types
 # Firebase Admin SDK removed - using frontend Firebase Web SDK instead
 from datetime import datetime
-from PIL import Image
+from kb_utils import (
+    LANG_KEYWORDS,
+    check_red_flags,
+    detect_language,
+    normalize_message,
+    search_knowledge_base,
+)
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging (set LOG_LEVEL=DEBUG for verbose output)
+log_level = (os.environ.get('LOG_LEVEL') or 'INFO').upper()
+if log_level in logging.getLevelNamesMapping():
+    logging.basicConfig(level=log_level)
+else:
+    # A typo in LOG_LEVEL shouldn't stop the app from booting
+    logging.basicConfig(level=logging.INFO)
+    logging.warning("Unknown LOG_LEVEL %r, using INFO", log_level)
+# Keep HTTP client and SDK logs out of the per-request path
+for noisy_logger in ('google', 'httpx', 'httpcore', 'urllib3'):
+    logging.getLogger(noisy_logger).setLevel(logging.WARNING)
 
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
 
 # Initialize Gemini client
-gemini_client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY", "default_key"))
+# One client per process with a large keep-alive pool and HTTP/2, so concurrent
+# requests reuse connections instead of paying a TLS handshake each
+GEMINI_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+gemini_client = genai.Client(
+    api_key=os.environ.get("GEMINI_API_KEY", "default_key"),
+    http_options=types.HttpOptions(
+        timeout=60_000,  # milliseconds
+        client_args={'limits': GEMINI_HTTP_LIMITS, 'http2': True},
+        async_client_args={'limits': GEMINI_HTTP_LIMITS, 'http2': True}
+    )
+)
+
+# Gemini calls run on a shared background event loop using the async client,
+# so in-flight requests share one loop instead of each blocking inside the SDK.
+# The loop is started lazily per process so forked workers get their own.
+_gemini_loop = None
+_gemini_loop_pid = None
+_gemini_loop_lock = threading.Lock()
+
+# Upper bound on waiting for the loop, above the HTTP timeout, so a stuck call
+# can't hang a request thread forever
+GEMINI_RESULT_TIMEOUT = 90  # seconds
+
+def get_gemini_loop():
+    """Return the Gemini event loop, starting it if needed"""
+    global _gemini_loop, _gemini_loop_pid
+    with _gemini_loop_lock:
+        if _gemini_loop is None or _gemini_loop_pid != os.getpid():
+            _gemini_loop = asyncio.new_event_loop()
+            _gemini_loop_pid = os.getpid()
+            threading.Thread(target=_gemini_loop.run_forever, name='gemini-loop', daemon=True).start()
+        return _gemini_loop
+
+def run_gemini_request(**kwargs):
+    """Run a generate_content call on the Gemini loop and wait for its response"""
+    future = asyncio.run_coroutine_threadsafe(
+        gemini_client.aio.models.generate_content(**kwargs),
+        get_gemini_loop()
+    )
+    try:
+        return future.result(timeout=GEMINI_RESULT_TIMEOUT)
+    finally:
+        # No-op once finished; cancels the call if we gave up waiting
+        future.cancel()
+
+# Marks the end of a Gemini stream handed from the loop to a request thread
+_STREAM_END = object()
+
+def stream_gemini_request(**kwargs):
+    """Stream generate_content chunks from the Gemini loop into the calling thread"""
+    chunks = queue.Queue()
+    
+    async def pump():
+        try:
+            async for chunk in await gemini_client.aio.models.generate_content_stream(**kwargs):
+                chunks.put(chunk)
+        except Exception as e:
+            chunks.put(e)
+        finally:
+            chunks.put(_STREAM_END)
+    
+    future = asyncio.run_coroutine_threadsafe(pump(), get_gemini_loop())
+    try:
+        while True:
+            try:
+                item = chunks.get(timeout=GEMINI_RESULT_TIMEOUT)
+            except queue.Empty:
+                raise TimeoutError("Gemini stream timed out")
+            if item is _STREAM_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Stops the call if the client disconnected or we timed out
+        future.cancel()
 
 # Initialize Firestore (optional) - For production, disable backend Firestore
 # The frontend will handle Firestore directly via Firebase Web SDK
@@ -30,75 +126,24 @@ firestore_enabled = False
 db = None
 logging.info("Backend Firestore disabled - using frontend Firebase Web SDK for chat history")
 
-# Load knowledge base
-def load_knowledge_base():
-    try:
-        with open('kb/ortho_kb.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        logging.error(f"Failed to load knowledge base: {e}")
-        return {}
-
-knowledge_base = load_knowledge_base()
-
-# Red flag keywords for medical safety
-RED_FLAG_KEYWORDS = [
-    'fever', 'swelling', 'uncontrolled bleeding', 'severe pain', 
-    'infection', 'pus', 'emergency', 'urgent', 'difficulty breathing',
-    'difficulty swallowing', 'allergic reaction', 'rash', 'nausea',
-    'vomiting', 'dizziness', 'fainting'
+# Magic bytes for the image formats Gemini accepts
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
 ]
 
-def detect_language(text):
-    """Simple language detection based on common patterns"""
-    text_lower = text.lower()
-    
-    # isiZulu patterns
-    if any(word in text_lower for word in ['ngiyabonga', 'sawubona', 'yebo', 'cha', 'kanjani', 'ngicela', 'amazinyo', 'ukudla']):
-        return 'isiZulu'
-    
-    # isiXhosa patterns  
-    if any(word in text_lower for word in ['enkosi', 'molo', 'ewe', 'hayi', 'kunjani', 'ndicela', 'amazinyo', 'ukutya']):
-        return 'isiXhosa'
-    
-    # Afrikaans patterns
-    if any(word in text_lower for word in ['dankie', 'hallo', 'ja', 'nee', 'hoe gaan dit', 'asseblief', 'tande', 'eet']):
-        return 'Afrikaans'
-    
-    # Sesotho patterns
-    if any(word in text_lower for word in ['kea leboha', 'dumela', 'ee', 'tjhe', 'ho joang', 'ke kopa', 'meno', 'ho ja']):
-        return 'Sesotho'
-    
-    # Default to English
-    return 'English'
-
-def check_red_flags(message):
-    """Check if message contains red flag keywords"""
-    message_lower = message.lower()
-    found_flags = []
-    for keyword in RED_FLAG_KEYWORDS:
-        if keyword in message_lower:
-            found_flags.append(keyword)
-    return found_flags
-
-def search_knowledge_base(message):
-    """Search knowledge base for relevant information"""
-    message_lower = message.lower()
-    relevant_info = []
-    
-    for topic, info in knowledge_base.items():
-        # Simple keyword matching - can be enhanced with more sophisticated search
-        if any(keyword in message_lower for keyword in info.get('keywords', [])):
-            relevant_info.append({
-                'topic': topic,
-                'content': info.get('content', ''),
-                'tips': info.get('tips', [])
-            })
-    
-    return relevant_info
+def detect_image_mime_type(image_bytes):
+    """Detect the image mime type from its header, or None if unsupported"""
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if image_bytes.startswith(signature):
+            return mime_type
+    # WebP is a RIFF container with a WEBP form type
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
 
 def process_image(image_data):
-    """Process base64 image data for Gemini API"""
+    """Process base64 image data for Gemini API, returning (bytes, mime_type)"""
     try:
         # Remove data URL prefix if present
         if ',' in image_data:
@@ -107,28 +152,24 @@ def process_image(image_data):
         # Decode base64 image
         image_bytes = base64.b64decode(image_data)
         
-        # Verify it's a valid image
-        img = Image.open(io.BytesIO(image_bytes))
-        img.verify()
+        # Check the header only; Gemini decodes the full image server-side
+        mime_type = detect_image_mime_type(image_bytes)
+        if not mime_type:
+            logging.error("Image processing error: unsupported image format")
+            return None
         
-        return image_bytes
+        return image_bytes, mime_type
     except Exception as e:
-        logging.error(f"Image processing error: {e}")
+        logging.error("Image processing error: %s", e)
         return None
 
-def generate_gemini_response(user_message, knowledge_info, red_flags, image_data=None):
-    """Generate response using Gemini API with emoji support, image analysis, and language awareness"""
-    try:
-        # Detect user language for response
-        user_language = detect_language(user_message)
-        
-        # Construct system prompt with emoji support and language awareness
-        system_prompt = f"""You are BracesCareBot, a helpful and cautious assistant providing orthodontic care advice.
+# System prompt with emoji support and language awareness
+SYSTEM_PROMPT_TEMPLATE = """You are BracesCareBot, a helpful and cautious assistant providing orthodontic care advice.
         
-        CRITICAL: The user is communicating in {user_language}. You MUST respond in the same language ({user_language}) that the user used.
+        CRITICAL: The user is communicating in {lang}. You MUST respond in the same language ({lang}) that the user used.
         
         IMPORTANT GUIDELINES:
-        - Always respond in {user_language} - the same language the user used
+        - Always respond in {lang} - the same language the user used
         - Always be supportive and encouraging 😊
         - Provide helpful, evidence-based information
         - If you detect serious symptoms or red flags, immediately recommend seeing an orthodontist or medical professional 🚨
@@ -139,71 +180,182 @@ def generate_gemini_response(user_message, knowledge_info, red_flags, image_data
         - For dental topics, use relevant emojis like 🦷, 😬, ✨, 🪥, 💙
         
         Use the provided knowledge base information to give accurate advice about braces, retainers, and orthodontic care."""
+
+LANG_SYSTEM_PROMPTS = {
+    lang: SYSTEM_PROMPT_TEMPLATE.format(lang=lang)
+    for lang in [*LANG_KEYWORDS, 'English']
+}
+
+IMAGE_CONTEXT_TEMPLATE = "\n\nIMAGE ANALYSIS: The user has shared an image. Please analyze the image in the context of orthodontic care and provide relevant advice about what you observe in {lang}. Look for braces, dental issues, or orthodontic appliances. Be specific about what you see and provide helpful guidance."
+
+KB_CONTEXT_HEADER = "\n\nRelevant information from knowledge base:\n"
+
+def format_kb_context(info):
+    """Format a knowledge base result for the prompt"""
+    tips = f"Tips: {', '.join(info['tips'])}\n" if info['tips'] else ""
+    return f"Topic: {info['topic']}\nContent: {info['content']}\n{tips}\n"
+
+# Bounded LRU cache of Gemini responses for repeated questions
+RESPONSE_CACHE_SIZE = 1024
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+def build_response_cache_key(message, knowledge_info, image_hash=None):
+    """Build a cache key from the normalized message, KB topics and image hash"""
+    normalized = ' '.join(message.lower.split())
+    topics = tuple(sorted(info['topic'] for info in knowledge_info))
+    return normalized, topics, image_hash
+
+def get_cached_response(key):
+    """Return a cached response and mark it as recently used"""
+    with _response_cache_lock:
+        response = _response_cache.get(key)
+        if response is not None:
+            _response_cache.move_to_end(key)
+        return response
+
+def cache_response(key, response):
+    """Cache a response, evicting the least recently used entry when full"""
+    with _response_cache_lock:
+        _response_cache[key] = response
+        _response_cache.move_to_end(key)
+        if len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_CONFIG = types.GenerateContentConfig(
+    temperature=0.7,
+    max_output_tokens=1000
+)
+
+EMPTY_RESPONSE_MESSAGE = "I apologize, but I'm having trouble generating a response right now. Please try again or contact your orthodontist if you have urgent concerns. 😔"
+
+def fallback_response(red_flags):
+    """Response used when the Gemini API fails"""
+    if red_flags:
+        return "I'm experiencing technical difficulties, but I noticed you mentioned some concerning symptoms. Please contact your orthodontist or seek medical attention immediately for proper care. 🚨"
+    return "I'm sorry, I'm experiencing technical difficulties right now. Please try again later or contact your orthodontist if you have urgent questions. 💙"
+
+def build_gemini_contents(message, knowledge_info, red_flags, image_data=None):
+    """Build Gemini prompt contents and the response cache key (None when uncacheable)"""
+    user_message = message.raw
+    
+    # Detect user language for response
+    user_language = detect_language(message)
+    
+    # Language-specific system prompts are precomputed at import
+    system_prompt = LANG_SYSTEM_PROMPTS[user_language]
+    
+    # Prepare context from knowledge base
+    kb_context = ""
+    if knowledge_info:
+        kb_context = KB_CONTEXT_HEADER + "".join(format_kb_context(info) for info in knowledge_info)
+    
+    # Add red flag warning if needed
+    red_flag_warning = ""
+    if red_flags:
+        red_flag_warning = f"\n\nIMPORTANT: The user mentioned potentially serious symptoms: {', '.join(red_flags)}. Please prioritize recommending they contact their orthodontist or seek medical attention immediately."
+    
+    # Handle image if provided
+    contents = []
+    image_context = ""
+    image_hash = None
+    
+    if image_data:
+        processed_image = process_image(image_data)
+        if processed_image:
+            image_bytes, mime_type = processed_image
+            image_hash = hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+            # Add image analysis context
+            image_context = IMAGE_CONTEXT_TEMPLATE.format(lang=user_language)
+            
+            contents = [
+                types.Part.from_bytes(
+                    data=image_bytes,
+                    mime_type=mime_type
+                ),
+                f"{system_prompt}\n\nUser question: {user_message}{kb_context}{red_flag_warning}{image_context}"
+            ]
+        else:
+            # If image processing failed, continue without image
+            contents = f"{system_prompt}\n\nUser question: {user_message}{kb_context}{red_flag_warning}"
+    else:
+        # No image, standard text prompt
+        contents = f"{system_prompt}\n\nUser question: {user_message}{kb_context}{red_flag_warning}"
+    
+    # Never serve cached answers when red flags are present
+    cache_key = None
+    if not red_flags:
+        cache_key = build_response_cache_key(message, knowledge_info, image_hash)
+    
+    return contents, cache_key
+
+def generate_gemini_response(message, knowledge_info, red_flags, image_data=None):
+    """Generate response using Gemini API with emoji support, image analysis, and language awareness"""
+    try:
+        contents, cache_key = build_gemini_contents(message, knowledge_info, red_flags, image_data)
         
-        # Prepare context from knowledge base
-        kb_context = ""
-        if knowledge_info:
-            kb_context = "\n\nRelevant information from knowledge base:\n"
-            for info in knowledge_info:
-                kb_context += f"Topic: {info['topic']}\n"
-                kb_context += f"Content: {info['content']}\n"
-                if info['tips']:
-                    kb_context += f"Tips: {', '.join(info['tips'])}\n"
-                kb_context += "\n"
+        cached = cache_key and get_cached_response(cache_key)
+        if cached:
+            return cached
         
-        # Add red flag warning if needed
-        red_flag_warning = ""
-        if red_flags:
-            red_flag_warning = f"\n\nIMPORTANT: The user mentioned potentially serious symptoms: {', '.join(red_flags)}. Please prioritize recommending they contact their orthodontist or seek medical attention immediately."
+        response = run_gemini_request(
+            model=GEMINI_MODEL,
+            contents=contents,
+            config=GEMINI_CONFIG
+        )
         
-        # Handle image if provided
-        contents = []
-        image_context = ""
+        if response.text and cache_key:
+            cache_response(cache_key, response.text)
         
-        if image_data:
-            processed_image = process_image(image_data)
-            if processed_image:
-                # Add image analysis context
-                image_context = f"\n\nIMAGE ANALYSIS: The user has shared an image. Please analyze the image in the context of orthodontic care and provide relevant advice about what you observe in {user_language}. Look for braces, dental issues, or orthodontic appliances. Be specific about what you see and provide helpful guidance."
-                
-                contents = [
-                    types.Part.from_bytes(
-                        data=processed_image,
-                        mime_type="image/jpeg"
-                    ),
-                    f"{system_prompt}\n\nUser question: {user_message}{kb_context}{red_flag_warning}{image_context}"
-                ]
-            else:
-                # If image processing failed, continue without image
-                contents = f"{system_prompt}\n\nUser question: {user_message}{kb_context}{red_flag_warning}"
-        else:
-            # No image, standard text prompt
-            contents = f"{system_prompt}\n\nUser question: {user_message}{kb_context}{red_flag_warning}"
+        return response.text or EMPTY_RESPONSE_MESSAGE
+        
+    except Exception as e:
+        logging.error("Gemini API error: %s", e)
+        return fallback_response(red_flags)
+
+def stream_gemini_response(message, knowledge_info, red_flags, image_data=None):
+    """Stream a Gemini response as text chunks; raises if it breaks after text was sent"""
+    text_chunks = []
+    try:
+        contents, cache_key = build_gemini_contents(message, knowledge_info, red_flags, image_data)
+        
+        cached = cache_key and get_cached_response(cache_key)
+        if cached:
+            yield cached
+            return
         
-        response = gemini_client.models.generate_content(
-            model="gemini-2.5-flash",
+        for chunk in stream_gemini_request(
+            model=GEMINI_MODEL,
             contents=contents,
-            config=types.GenerateContentConfig(
-                temperature=0.7,
-                max_output_tokens=1000
-            )
-        )
+            config=GEMINI_CONFIG
+        ):
+            if chunk.text:
+                text_chunks.append(chunk.text)
+                yield chunk.text
         
-        return response.text or "I apologize, but I'm having trouble generating a response right now. Please try again or contact your orthodontist if you have urgent concerns. 😔"
+        if not text_chunks:
+            yield EMPTY_RESPONSE_MESSAGE
+        elif cache_key:
+            cache_response(cache_key, "".join(text_chunks))
         
     except Exception as e:
-        logging.error(f"Gemini API error: {e}")
-        if red_flags:
-            return "I'm experiencing technical difficulties, but I noticed you mentioned some concerning symptoms. Please contact your orthodontist or seek medical attention immediately for proper care. 🚨"
-        return "I'm sorry, I'm experiencing technical difficulties right now. Please try again later or contact your orthodontist if you have urgent questions. 💙"
+        logging.error("Gemini API error: %s", e)
+        # Don't append the fallback to a partially streamed answer
+        if text_chunks:
+            raise
+        yield fallback_response(red_flags)
+
+def format_sse_event(payload):
+    """Format a payload as a server-sent event"""
+    return f"data: {json.dumps(payload)}\n\n"
 
 # Firestore operations now handled by frontend Firebase Web SDK
 
-@app.route('/')
-def index():
-    """Serve the main chat interface with Firebase config"""
+def render_index_html():
+    """Render the main chat interface with Firebase config injected"""
     # Read the HTML file and inject Firebase config
-    with open('static/index.html', 'r') as f:
+    with open('static/index.html', 'r', encoding='utf-8') as f:
         html_content = f.read()
     
     # Inject Firebase configuration from environment variables
@@ -232,7 +384,22 @@ def index():
         config_script + '\n        // Firebase configuration - will be set via environment variables'
     )
     
-    return html_content
+    return html_content.encode('utf-8')
+
+# The rendered page only depends on startup config, so build it once
+INDEX_HTML = render_index_html()
+INDEX_ETAG = hashlib.md5(INDEX_HTML).hexdigest()
+
+@app.route('/')
+def index():
+    """Serve the main chat interface with Firebase config"""
+    return send_file(
+        io.BytesIO(INDEX_HTML),
+        mimetype='text/html',
+        conditional=True,
+        etag=INDEX_ETAG,
+        max_age=60
+    )
 
 @app.route('/static/<path:filename>')
 def static_files(filename):
@@ -255,29 +422,53 @@ def chat():
         if not user_message:
             return jsonify({'error': 'Message cannot be empty'}), 400
         
+        # Lowercase and tokenize once for all keyword lookups
+        message = normalize_message(user_message)
+        
         # Check for red flags
-        red_flags = check_red_flags(user_message)
+        red_flags = check_red_flags(message)
         
         # Search knowledge base
-        knowledge_info = search_knowledge_base(user_message)
+        knowledge_info = search_knowledge_base(message)
+        
+        metadata = {
+            'red_flags': red_flags,
+            'knowledge_used': len(knowledge_info) > 0,
+            'image_analyzed': image_data is not None
+        }
+        
+        # Stream the response as server-sent events when the client asks for it
+        if data.get('stream', False):
+            def generate_events():
+                yield format_sse_event(metadata)
+                try:
+                    for text in stream_gemini_response(message, knowledge_info, red_flags, image_data):
+                        yield format_sse_event({'delta': text})
+                except Exception:
+                    # Let the client mark the partial answer as incomplete
+                    yield format_sse_event({'error': 'The response was interrupted. Please try again. 😔'})
+                    return
+                yield format_sse_event({'done': True})
+            
+            return Response(
+                stream_with_context(generate_events()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
         
         # Generate response (with image support and language awareness)
-        bot_response = generate_gemini_response(user_message, knowledge_info, red_flags, image_data)
+        bot_response = generate_gemini_response(message, knowledge_info, red_flags, image_data)
         
         # Note: Chat history is now handled by frontend Firebase Web SDK
         
-        return jsonify({
-            'response': bot_response,
-            'red_flags': red_flags,
-            'knowledge_used': len(knowledge_info) > 0,
-            'image_analyzed': image_data is not None
-        })
+        return jsonify({'response': bot_response, **metadata})
         
     except Exception as e:
-        logging.error(f"Chat endpoint error: {e}")
+        logging.error("Chat endpoint error: %s", e)
         return jsonify({'error': 'An error occurred processing your message. Please try again. 😔'}), 500
 
 # Chat history endpoint removed - handled by frontend Firebase Web SDK
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(host='0.0.0.0', port=5000, debug=bool(os.environ.get('DEV')))
\ No newline at end of file
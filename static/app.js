@@ -145,38 +145,67 @@ class BracesCareBot {
         // Show typing indicator
         this.showTypingIndicator();
         
+        let botMessage = null;
+        let botText = '';
+        
         try {
-            const response = await this.callChatAPI(message, consent);
-            
-            if (response.error) {
-                throw new Error(response.error);
-            }
+            let finished = false;
             
-            // Hide typing indicator
-            this.hideTypingIndicator();
+            await this.streamChatAPI(message, consent, (event) => {
+                if (event.error) {
+                    throw new Error(event.error);
+                }
+                
+                if (event.red_flags !== undefined) {
+                    // Metadata arrives first - show the bot message and fill it in as text streams
+                    this.hideTypingIndicator();
+                    
+                    // Clear image if it was sent
+                    if (this.currentImage) {
+                        this.removeImage();
+                    }
+                    
+                    botMessage = this.addMessage('', 'bot', {
+                        redFlags: event.red_flags,
+                        knowledgeUsed: event.knowledge_used
+                    });
+                } else if (event.delta !== undefined && botMessage) {
+                    botText += event.delta;
+                    botMessage.querySelector('.message-content').innerHTML = this.formatMessageText(botText);
+                    this.scrollToBottom();
+                } else if (event.done) {
+                    finished = true;
+                }
+            });
             
-            // Clear image if it was sent
-            if (this.currentImage) {
-                this.removeImage();
+            if (!finished) {
+                throw new Error('Response stream ended unexpectedly');
             }
             
-            // Add bot response
-            this.addMessage(response.response, 'bot', {
-                redFlags: response.red_flags,
-                knowledgeUsed: response.knowledge_used
-            });
-            
             // Save to local storage
             this.saveChatHistory();
             
         } catch (error) {
             console.error('Chat error:', error);
             this.hideTypingIndicator();
-            this.addMessage(
-                'I apologize, but I encountered an error. Please try again or contact your orthodontist if you have urgent concerns.',
-                'bot',
-                { error: true }
-            );
+            
+            if (botMessage) {
+                // Keep the partial answer in its bubble and mark it as incomplete
+                botMessage.querySelector('.message-content').innerHTML = `
+                    ${this.formatMessageText(botText)}
+                    <div class="stream-interrupted">
+                        <i class="fas fa-exclamation-circle"></i>
+                        This response was interrupted. Please try again or contact your orthodontist if you have urgent concerns.
+                    </div>
+                `;
+                this.saveChatHistory();
+            } else {
+                this.addMessage(
+                    'I apologize, but I encountered an error. Please try again or contact your orthodontist if you have urgent concerns.',
+                    'bot',
+                    { error: true }
+                );
+            }
         } finally {
             this.setLoading(false);
             this.messageInput.focus();
@@ -247,6 +276,8 @@ class BracesCareBot {
         
         this.chatMessages.appendChild(messageDiv);
         this.scrollToBottom();
+        
+        return messageDiv;
     }
     
     formatMessageText(text) {
@@ -523,10 +554,11 @@ class BracesCareBot {
         this.fileInput.value = '';
     }
     
-    async callChatAPI(message, consent) {
+    async streamChatAPI(message, consent, onEvent) {
         const payload = {
             message: message,
-            consent: consent
+            consent: consent,
+            stream: true
         };
         
         // Add image if present
@@ -546,7 +578,27 @@ class BracesCareBot {
             throw new Error(`HTTP ${response.status}: ${response.statusText}`);
         }
         
-        return await response.json();
+        // Read server-sent events as they arrive
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) {
+                break;
+            }
+            
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            
+            for (const event of events) {
+                if (event.startsWith('data: ')) {
+                    onEvent(JSON.parse(event.slice(6)));
+                }
+            }
+        }
     }
 }
 